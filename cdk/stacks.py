@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
 
-from aws_cdk import CfnOutput, RemovalPolicy, Stack
+from aws_cdk import CfnOutput, Duration, RemovalPolicy, Stack
 from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
@@ -44,6 +44,9 @@ class PlantDetectionStack(Stack):
             runtime=_lambda.Runtime.PYTHON_3_8,
             handler="main_handler.handler",
             code=_lambda.Code.from_asset("lambda_functions"),
+            # Leave room for the short client timeouts to fail and be recorded
+            # by the circuit breakers instead of the invocation timing out
+            timeout=Duration.seconds(60),
             environment={"SNS_TOPIC_ARN": sns_topic.topic_arn},
         )
 
@@ -55,9 +58,14 @@ class PlantDetectionStack(Stack):
             )
         )
 
-        # S3 trigger to Lambda
+        # S3 trigger to Lambda, limited to camera uploads so frames stored by
+        # the detection API under sync/ do not invoke it
         detection_lambda.add_event_source(
-            S3EventSource(bucket, events=[s3.EventType.OBJECT_CREATED])
+            S3EventSource(
+                bucket,
+                events=[s3.EventType.OBJECT_CREATED],
+                filters=[s3.NotificationKeyFilter(prefix="camera_frames/")],
+            )
         )
 
         # Grant Lambda permissions to read from S3 and publish to SNS
@@ -88,6 +96,99 @@ class PlantDetectionStack(Stack):
         # Pass table name to Lambda as environment variable
         detection_lambda.add_environment("DYNAMODB_TABLE_NAME", table.table_name)
 
+        # DynamoDB table for per-camera configuration keyed by S3 key prefix
+        camera_config_table = dynamodb.Table(
+            self,
+            "CameraConfigTable",
+            partition_key=dynamodb.Attribute(
+                name="prefix", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        # Lambda only reads camera config; it is cached in the warm container
+        camera_config_table.grant_read_data(detection_lambda)
+        detection_lambda.add_environment(
+            "CAMERA_CONFIG_TABLE_NAME", camera_config_table.table_name
+        )
+        detection_lambda.add_environment("CAMERA_CONFIG_TTL_SECONDS", "300")
+
+        # Per-camera SNS topics must be named plant-detection-* in this account
+        # and region; config rows pointing elsewhere are ignored by the Lambda
+        camera_topic_arn_prefix = self.format_arn(
+            service="sns", resource="plant-detection-"
+        )
+        camera_topics_policy = iam.PolicyStatement(
+            actions=["sns:Publish"],
+            resources=[f"{camera_topic_arn_prefix}*"],
+        )
+        detection_lambda.add_to_role_policy(camera_topics_policy)
+        detection_lambda.add_environment(
+            "CAMERA_SNS_TOPIC_ARN_PREFIX", camera_topic_arn_prefix
+        )
+
+        # Lambda function that writes metadata and sends notifications for
+        # frames analysed by the detection API, invoked asynchronously so they
+        # stay off the response path. Failed events are retried, then kept in
+        # a dead-letter queue.
+        persist_lambda = _lambda.Function(
+            self,
+            "PlantDetectionPersistLambda",
+            runtime=_lambda.Runtime.PYTHON_3_8,
+            handler="persist_handler.handler",
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.seconds(30),
+            retry_attempts=2,
+            dead_letter_queue_enabled=True,
+            environment={
+                "SNS_TOPIC_ARN": sns_topic.topic_arn,
+                "DYNAMODB_TABLE_NAME": table.table_name,
+            },
+        )
+
+        table.grant_write_data(persist_lambda)
+        sns_topic.grant_publish(persist_lambda)
+        persist_lambda.add_to_role_policy(camera_topics_policy)
+
+        # Lambda function for synchronous, low-latency detection from image bytes
+        detection_api_lambda = _lambda.Function(
+            self,
+            "PlantDetectionApiLambda",
+            runtime=_lambda.Runtime.PYTHON_3_8,
+            handler="sync_handler.handler",
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.seconds(10),
+            memory_size=512,
+            environment={
+                "SNS_TOPIC_ARN": sns_topic.topic_arn,
+                "S3_BUCKET_NAME": bucket.bucket_name,
+                "PERSIST_FUNCTION_NAME": persist_lambda.function_name,
+                "CAMERA_CONFIG_TABLE_NAME": camera_config_table.table_name,
+                "CAMERA_CONFIG_TTL_SECONDS": "300",
+                "CAMERA_SNS_TOPIC_ARN_PREFIX": camera_topic_arn_prefix,
+            },
+        )
+
+        detection_api_lambda.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["rekognition:DetectLabels"],
+                resources=["*"],
+            )
+        )
+
+        # Frames are written under the sync/ prefix, outside the S3 trigger,
+        # and removed again when they cannot be analysed
+        bucket.grant_put(detection_api_lambda)
+        bucket.grant_delete(detection_api_lambda)
+        camera_config_table.grant_read_data(detection_api_lambda)
+        persist_lambda.grant_invoke(detection_api_lambda)
+
+        # Function URL so clients can call the API directly, signed with IAM
+        detection_api_url = detection_api_lambda.add_function_url(
+            auth_type=_lambda.FunctionUrlAuthType.AWS_IAM
+        )
+
         # Export resource details as outputs
         CfnOutput(
             self,
@@ -103,6 +204,20 @@ class PlantDetectionStack(Stack):
             description="Name of the DynamoDB table for frame metadata",
         )
 
+        CfnOutput(
+            self,
+            "CameraConfigTableName",
+            value=camera_config_table.table_name,
+            description="Name of the DynamoDB table for per-camera configuration",
+        )
+
+        CfnOutput(
+            self,
+            "DetectionApiUrl",
+            value=detection_api_url.url,
+            description="Function URL for synchronous plant detection",
+        )
+
         CfnOutput(
             self,
             "SNSTopicArn",
@@ -1,10 +1,11 @@
 import json
 import logging
 import os
-from datetime import datetime
-from decimal import Decimal
 
 import boto3
+from utils.camera_config import get_camera_config
+from utils.circuit_breaker import client_config
+from utils.metadata import SYNC_FRAME_PREFIX, queued_count, save_frame_metadata
 from utils.notifications import NotificationService
 from utils.rekognition import PlantDetector
 
@@ -15,62 +16,24 @@ logger = logging.getLogger()
 # Initialize AWS clients
 aws_region = os.getenv("AWS_REGION", "us-east-1")
 logger.info(f"Using AWS_REGION: {aws_region}")
-cloudwatch = boto3.client("cloudwatch", region_name=aws_region)
-dynamodb = boto3.resource("dynamodb", region_name=aws_region)
-
-
-# Recursive function to convert floats to Decimal
-def convert_to_decimal(data):
-    if isinstance(data, list):
-        return [convert_to_decimal(item) for item in data]
-    elif isinstance(data, dict):
-        return {key: convert_to_decimal(value) for key, value in data.items()}
-    elif isinstance(data, float):
-        return Decimal(str(data))  # Convert float to Decimal
-    else:
-        return data
-
-
-# Helper function to save metadata to DynamoDB
-def save_frame_metadata(bucket, key, size, plants_detected, plant_labels):
-    table_name = os.getenv("DYNAMODB_TABLE_NAME")
-    if not table_name:
-        logger.error("DYNAMODB_TABLE_NAME environment variable is not set.")
-        raise ValueError("DYNAMODB_TABLE_NAME environment variable is required.")
-
-    table = dynamodb.Table(table_name)  # Initialize table dynamically
-    frame_id = f"{bucket}/{key}"
-    timestamp = datetime.utcnow().isoformat()
-
-    item = {
-        "frame_id": frame_id,
-        "bucket": bucket,
-        "key": key,
-        "size": size,
-        "plants_detected": plants_detected,
-        "plant_labels": plant_labels,
-        "timestamp": timestamp,
-    }
-
-    try:
-        # Convert all float values in the item to Decimal
-        item = convert_to_decimal(item)
-        table.put_item(Item=item)
-        logger.info("Frame metadata saved to DynamoDB: %s", item)
-    except Exception as e:
-        logger.error("Error saving metadata to DynamoDB: %s", e)
-        raise
+cloudwatch = boto3.client(
+    "cloudwatch", region_name=aws_region, config=client_config("cloudwatch")
+)
 
 
 def handler(event, context):
     logger.info("Event received: %s", json.dumps(event))
     frames_processed = 0
     total_plants_detected = 0
+    frames_deferred = 0
 
     for record in event.get("Records", []):
         bucket = record["s3"]["bucket"]["name"]
         key = record["s3"]["object"]["key"]
         size = record["s3"]["object"].get("size", 0)  # Default size to 0 if not present
+        if key.startswith(SYNC_FRAME_PREFIX):
+            logger.info("Skipping %s, already analysed by the detection API.", key)
+            continue
         logger.info(
             "Processing file from bucket: %s, key: %s, size: %s bytes",
             bucket,
@@ -78,9 +41,10 @@ def handler(event, context):
             size,
         )
 
-        # Initialize detection and notification services
-        plant_detector = PlantDetector(bucket, key)
-        notifier = NotificationService()
+        # Initialize detection and notification services for this camera
+        camera_config = get_camera_config(key)
+        plant_detector = PlantDetector(bucket, key, camera_config)
+        notifier = NotificationService(camera_config)
 
         frames_processed += 1  # Increment frames processed for each record
 
@@ -92,14 +56,23 @@ def handler(event, context):
         ]  # Total count of plant instances
         total_plants_detected += plants_detected
 
-        if plants_detected > 0:
+        needs_reprocessing = detection_result.get("reprocess", False)
+        if needs_reprocessing:
+            frames_deferred += 1
+            logger.warning("Image %s marked for reprocessing.", key)
+        elif plants_detected > 0:
             logger.info("Plants detected in image %s: %s", key, plant_labels)
             notifier.send_notification(key, plants_detected)
         else:
             logger.info("No plants detected in image: %s", key)
 
         # Publish frame metadata to DynamoDB
-        save_frame_metadata(bucket, key, size, plants_detected, plant_labels)
+        save_frame_metadata(
+            bucket, key, size, plants_detected, plant_labels, needs_reprocessing
+        )
+
+    # Retry notifications deferred during an SNS outage if it has recovered
+    NotificationService().flush_deferred_notifications()
 
     # Publish CloudWatch metrics
     try:
@@ -116,10 +89,22 @@ def handler(event, context):
                     "Value": total_plants_detected,
                     "Unit": "Count",
                 },
+                {
+                    "MetricName": "FramesDeferredForReprocessing",
+                    "Value": frames_deferred,
+                    "Unit": "Count",
+                },
             ],
         )
         logger.info("CloudWatch metrics published successfully.")
     except Exception as e:
         logger.error("Failed to publish CloudWatch metrics: %s", e)
 
+    # Fail the invocation so Lambda retries the event, and eventually sends it
+    # to the DLQ, instead of the metadata living only in this container
+    if queued_count():
+        raise RuntimeError(
+            f"{queued_count()} metadata write(s) still queued for DynamoDB."
+        )
+
     return {"statusCode": 200, "body": json.dumps({"message": "Process completed"})}
@@ -0,0 +1,39 @@
+import logging
+
+from utils.metadata import queued_count, save_frame_metadata
+from utils.notifications import NotificationService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def handler(event, context):
+    """
+    Persist a frame analysed by the synchronous detection API.
+
+    Invoked asynchronously by the API with the frame's location, size and
+    plant labels, so the metadata write and notification stay off the
+    response path. The invocation fails while metadata writes are still
+    queued, before notifying, so Lambda's retries and DLQ keep the event and
+    a retry does not send the notification twice.
+    """
+    key = event["key"]
+    plants_detected = event["plants_detected"]
+
+    save_frame_metadata(
+        event["bucket"], key, event["size"], plants_detected, event["plant_labels"]
+    )
+    if queued_count():
+        raise RuntimeError(
+            f"{queued_count()} metadata write(s) still queued; retrying frame {key}."
+        )
+
+    notification_service = NotificationService(
+        {"sns_topic_arn": event.get("sns_topic_arn")}
+    )
+    if plants_detected > 0:
+        notification_service.send_notification(key, plants_detected)
+    notification_service.flush_deferred_notifications()
+
+    return {"statusCode": 200, "body": f"Frame {key} persisted."}
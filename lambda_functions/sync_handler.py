@@ -0,0 +1,181 @@
+import base64
+import binascii
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from utils.camera_config import get_camera_config
+from utils.circuit_breaker import client_config
+from utils.metadata import SYNC_FRAME_PREFIX
+from utils.rekognition import PlantDetector
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+# Initialize AWS clients
+aws_region = os.getenv("AWS_REGION", "us-east-1")
+s3_client = boto3.client("s3", region_name=aws_region, config=client_config("s3"))
+lambda_client = boto3.client(
+    "lambda", region_name=aws_region, config=client_config("lambda")
+)
+
+# Rekognition rejects raw image bytes larger than 5 MB
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+# Reused across warm invocations to run the S3 upload alongside detection
+executor = ThreadPoolExecutor(max_workers=4)
+
+
+def _response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(body),
+    }
+
+
+# Helper function to extract the image bytes and camera key from the request
+def parse_request(event):
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        raw = base64.b64decode(body, validate=True)
+    else:
+        raw = body.encode()
+    params = event.get("queryStringParameters") or {}
+    headers = event.get("headers") or {}  # Function URLs lowercase header names
+
+    if headers.get("content-type", "").startswith("application/json"):
+        payload = json.loads(raw)
+        return base64.b64decode(payload["image"], validate=True), payload.get("key")
+    return raw, params.get("key")
+
+
+# Helper function to add a unique suffix so repeated uploads never overwrite
+def unique_frame_key(camera_key):
+    name, extension = os.path.splitext(camera_key or "")
+    if name and not name.endswith("/"):
+        name += "-"
+    return f"{name}{uuid.uuid4().hex}{extension or '.jpg'}"
+
+
+# Helper function to upload the frame to S3
+def store_frame(bucket, key, image_bytes):
+    try:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=image_bytes)
+        logger.info("Frame stored in S3: %s/%s", bucket, key)
+        return True
+    except Exception as e:
+        logger.error("Error storing frame %s in S3: %s", key, e)
+        return False
+
+
+# Helper function to hand the metadata write and notification to the persist
+# function, invoked asynchronously so they stay off the response path
+def schedule_persist(frame):
+    function_name = os.getenv("PERSIST_FUNCTION_NAME")
+    if not function_name:
+        logger.error(
+            "PERSIST_FUNCTION_NAME is not set; frame %s not persisted.", frame["key"]
+        )
+        return False
+    try:
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps(frame),
+        )
+        logger.info("Persist scheduled for frame %s", frame["key"])
+        return True
+    except Exception as e:
+        logger.error("Error scheduling persist for frame %s: %s", frame["key"], e)
+        return False
+
+
+# Helper function to remove a frame that will not be kept
+def discard_frame(bucket, key):
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        logger.error("Error removing frame %s from S3: %s", key, e)
+
+
+def handler(event, context):
+    """
+    Detect plants in an image sent in the request body and respond immediately.
+
+    The body is either the raw image (binary, base64-encoded by the function
+    URL) or JSON with a base64 "image" field. An optional "key" names the frame
+    as the camera would in S3, selecting its per-camera configuration; a
+    unique suffix is always added so frames are never overwritten. The
+    frame upload to S3 runs alongside Rekognition; the metadata write and
+    notification are handed to the persist function once labels are known.
+    "persisted" in the response is false if the upload or the hand-off
+    failed. Frames are not kept when Rekognition is unavailable; the 503
+    response asks the client to retry.
+    """
+    try:
+        image_bytes, camera_key = parse_request(event)
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        logger.error("Invalid detection request: %s", e)
+        return _response(400, {"message": "Request must contain an image."})
+
+    if not image_bytes:
+        return _response(400, {"message": "Request must contain an image."})
+    if camera_key is not None and not isinstance(camera_key, str):
+        return _response(400, {"message": "Frame key must be a string."})
+    if len(image_bytes) > MAX_IMAGE_BYTES:
+        return _response(413, {"message": "Image exceeds the 5 MB limit."})
+
+    bucket = os.getenv("S3_BUCKET_NAME")
+    camera_key = unique_frame_key(camera_key)
+    key = f"{SYNC_FRAME_PREFIX}{camera_key}"
+    logger.info("Processing %d bytes for frame %s", len(image_bytes), key)
+
+    camera_config = get_camera_config(camera_key)
+    upload = executor.submit(store_frame, bucket, key, image_bytes)
+
+    plant_detector = PlantDetector(bucket, key, camera_config, image_bytes)
+    detection_result = plant_detector.detect_multiple()
+    plant_labels = detection_result["labels"]
+    plants_detected = detection_result["total_instances"]
+
+    if detection_result.get("invalid_image"):
+        # Do not keep frames Rekognition cannot read
+        upload.result()
+        discard_frame(bucket, key)
+        return _response(400, {"message": "Image format or size is not supported."})
+    if detection_result.get("reprocess"):
+        # Nothing reprocesses sync/ frames, so the client retries the request
+        upload.result()
+        discard_frame(bucket, key)
+        return _response(
+            503, {"message": "Detection temporarily unavailable; retry later."}
+        )
+
+    # Lambda freezes the container once the handler returns, so wait for the
+    # upload that was overlapped with detection before responding. Metadata
+    # only refers to frames that were actually stored.
+    persisted = upload.result() and schedule_persist(
+        {
+            "bucket": bucket,
+            "key": key,
+            "size": len(image_bytes),
+            "plants_detected": plants_detected,
+            "plant_labels": plant_labels,
+            "sns_topic_arn": camera_config.get("sns_topic_arn"),
+        }
+    )
+
+    return _response(
+        200,
+        {
+            "frame_id": f"{bucket}/{key}",
+            "labels": plant_labels,
+            "total_instances": plants_detected,
+            "persisted": persisted,
+        },
+    )
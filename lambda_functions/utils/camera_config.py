@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import time
+
+import boto3
+from utils.circuit_breaker import client_config, get_circuit_breaker, is_transient_error
+
+logger = logging.getLogger()
+
+DEFAULT_PLANT_LABELS = ["plant", "leaf", "potted plant", "herbs", "herbal"]
+
+
+def default_camera_config():
+    """
+    Return the configuration used for cameras without an entry in the store.
+    """
+    return {
+        "prefix": "",
+        "min_confidence": 70.0,
+        "max_labels": 50,
+        "plant_labels": list(DEFAULT_PLANT_LABELS),
+        "roi": None,
+        "sns_topic_arn": os.getenv("SNS_TOPIC_ARN"),
+    }
+
+
+def _normalize(item):
+    """
+    Merge a DynamoDB item over the defaults, converting Decimal values to the
+    numeric types Rekognition expects.
+
+    Raises:
+        ValueError: If the item has no prefix or an out-of-range setting.
+    """
+    config = default_camera_config()
+    if not isinstance(item.get("prefix"), str) or not item["prefix"]:
+        raise ValueError("prefix must be a non-empty string")
+    config["prefix"] = item["prefix"]
+    if item.get("min_confidence") is not None:
+        config["min_confidence"] = float(item["min_confidence"])
+        if not 0 <= config["min_confidence"] <= 100:
+            raise ValueError("min_confidence must be between 0 and 100")
+    if item.get("max_labels") is not None:
+        config["max_labels"] = int(item["max_labels"])
+        if config["max_labels"] < 1:
+            raise ValueError("max_labels must be at least 1")
+    if item.get("plant_labels"):
+        # DynamoDB string sets arrive as Python sets
+        if not isinstance(item["plant_labels"], (list, tuple, set)):
+            raise ValueError("plant_labels must be a list or string set")
+        config["plant_labels"] = [str(label).lower() for label in item["plant_labels"]]
+    if item.get("roi"):
+        missing = {"Left", "Top", "Width", "Height"} - set(item["roi"])
+        if missing:
+            raise ValueError(f"roi is missing {sorted(missing)}")
+        roi = {
+            edge: float(item["roi"][edge])
+            for edge in ("Left", "Top", "Width", "Height")
+        }
+        if not all(0 <= value <= 1 for value in roi.values()):
+            raise ValueError("roi values must be ratios between 0 and 1")
+        if roi["Width"] == 0 or roi["Height"] == 0:
+            raise ValueError("roi must have a non-zero width and height")
+        config["roi"] = roi
+    if item.get("sns_topic_arn"):
+        # The Lambda role may only publish to topics under this ARN prefix
+        allowed_prefix = os.getenv("CAMERA_SNS_TOPIC_ARN_PREFIX")
+        if allowed_prefix and item["sns_topic_arn"].startswith(allowed_prefix):
+            config["sns_topic_arn"] = item["sns_topic_arn"]
+        else:
+            logger.warning(
+                "Ignoring sns_topic_arn %s for prefix %s; the Lambda cannot publish "
+                "to it. Topic names must start with %s.",
+                item["sns_topic_arn"],
+                item["prefix"],
+                allowed_prefix,
+            )
+    return config
+
+
+def _ttl_from_env(default=300.0):
+    """
+    Read the cache lifetime from CAMERA_CONFIG_TTL_SECONDS, falling back to the
+    default when it is unset or invalid.
+    """
+    value = os.getenv("CAMERA_CONFIG_TTL_SECONDS")
+    if value:
+        try:
+            ttl_seconds = float(value)
+            if ttl_seconds >= 0:
+                return ttl_seconds
+        except ValueError:
+            pass
+        logger.error("Invalid value for CAMERA_CONFIG_TTL_SECONDS: %s", value)
+    return default
+
+
+class CameraConfigStore:
+    def __init__(self, table_name=None, ttl_seconds=None, clock=time.monotonic):
+        """
+        Initialize the store backed by a DynamoDB table keyed by S3 key prefix.
+
+        Parameters:
+            table_name (str): The config table, defaults to CAMERA_CONFIG_TABLE_NAME.
+            ttl_seconds (float): Cache lifetime, defaults to CAMERA_CONFIG_TTL_SECONDS.
+            clock (callable): Monotonic time source, overridable for tests.
+        """
+        self.table_name = table_name or os.getenv("CAMERA_CONFIG_TABLE_NAME")
+        self.ttl_seconds = (
+            float(ttl_seconds) if ttl_seconds is not None else _ttl_from_env()
+        )
+        self._clock = clock
+        self._configs = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        if self.table_name:
+            aws_region = os.getenv("AWS_REGION", "us-east-1")
+            dynamodb = boto3.resource(
+                "dynamodb",
+                region_name=aws_region,
+                config=client_config("camera_config"),
+            )
+            self.table = dynamodb.Table(self.table_name)
+
+    def get(self, object_key):
+        """
+        Return the configuration for the camera that uploaded an S3 object.
+
+        The longest configured prefix matching the key wins. Entries are served
+        from the in-process cache; the first lookup loads synchronously and
+        expired entries are refreshed in a background thread while the stale
+        copy keeps being served.
+
+        Parameters:
+            object_key (str): The S3 object key of the frame.
+        """
+        if not self.table_name:
+            return default_camera_config()
+
+        with self._lock:
+            configs = self._configs
+            loaded_at = self._loaded_at
+        if configs is None:
+            self.refresh()
+            configs = self._configs or []
+        elif self._clock() - loaded_at >= self.ttl_seconds:
+            self._refresh_in_background()
+
+        for config in configs:
+            if object_key.startswith(config["prefix"]):
+                return dict(config)
+        return default_camera_config()
+
+    def refresh(self):
+        """
+        Reload all camera configurations from DynamoDB into the cache.
+
+        On failure the previous cache, or the defaults if nothing was loaded
+        yet, is kept until the TTL expires again, so a DynamoDB problem does
+        not add a scan to every record. Malformed rows are logged and skipped.
+        """
+        breaker = get_circuit_breaker("camera_config")
+        if not breaker.allow_request():
+            logger.warning("Camera config circuit is open; using cached config.")
+            self._keep_cache()
+            return
+        try:
+            items = []
+            kwargs = {}
+            while True:
+                response = self.table.scan(**kwargs)
+                items.extend(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+            breaker.record_success()
+        except Exception as e:
+            if is_transient_error(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()  # DynamoDB answered; the table is wrong
+            logger.error("Error loading camera config from DynamoDB: %s", e)
+            self._keep_cache()
+            return
+
+        configs = []
+        for item in items:
+            try:
+                configs.append(_normalize(item))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logger.error(
+                    "Skipping invalid camera config %s: %s", item.get("prefix"), e
+                )
+
+        # Longest prefix first so the most specific camera entry matches
+        configs.sort(key=lambda config: len(config["prefix"]), reverse=True)
+        with self._lock:
+            self._configs = configs
+            self._loaded_at = self._clock()
+        logger.info("Loaded %d camera configuration(s).", len(configs))
+
+    def _keep_cache(self):
+        """
+        Serve the current cache, or the defaults, until the TTL expires again.
+        """
+        with self._lock:
+            if self._configs is None:
+                self._configs = []
+            self._loaded_at = self._clock()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refresh_thread and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self.refresh, daemon=True)
+            self._refresh_thread.start()
+
+
+# Shared store so the cache survives between warm invocations
+_store = None
+
+
+def get_camera_config(object_key):
+    """
+    Return the configuration for an S3 object key from the shared store.
+
+    Parameters:
+        object_key (str): The S3 object key of the frame.
+    """
+    global _store
+    if _store is None:
+        _store = CameraConfigStore()
+    return _store.get(object_key)
+
+
+def reset_camera_config_store():
+    """
+    Discard the shared store and its cache, e.g. between tests.
+    """
+    global _store
+    _store = None
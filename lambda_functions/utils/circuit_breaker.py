@@ -0,0 +1,240 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from botocore import exceptions as botocore_exceptions
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Error codes AWS returns when a service is throttling or temporarily degraded
+TRANSIENT_ERROR_CODES = {
+    "InternalError",
+    "InternalFailure",
+    "InternalServerError",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestTimeout",
+    "RequestTimeoutException",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+    "Throttled",
+    "ThrottledException",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+
+# Breakers live at module level so their state is shared across records and
+# survives between warm invocations of the same Lambda container.
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def _setting(service_name, setting, default, cast):
+    """
+    Read a breaker setting from the environment.
+
+    A per-service variable (e.g. CIRCUIT_BREAKER_SNS_FAILURE_RATE) takes
+    precedence over the global one (e.g. CIRCUIT_BREAKER_FAILURE_RATE).
+    """
+    for env_name in (
+        f"CIRCUIT_BREAKER_{service_name.upper()}_{setting}",
+        f"CIRCUIT_BREAKER_{setting}",
+    ):
+        value = os.getenv(env_name)
+        if value:
+            try:
+                return cast(value)
+            except ValueError:
+                logger.error("Invalid value for %s: %s", env_name, value)
+    return default
+
+
+def is_transient_error(error):
+    """
+    Check whether an error means the service is unavailable rather than that
+    the request itself was wrong.
+
+    Throttling, 5xx responses and connection or timeout errors are transient
+    and count against a circuit breaker. Other client errors, such as a
+    missing resource or a denied permission, will fail again on retry.
+
+    Parameters:
+        error (Exception): The exception raised by a boto3 call.
+    """
+    if isinstance(error, botocore_exceptions.ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in TRANSIENT_ERROR_CODES or status >= 500
+    return isinstance(error, botocore_exceptions.BotoCoreError) and not isinstance(
+        error, botocore_exceptions.ParamValidationError
+    )
+
+
+def client_config(service_name):
+    """
+    Return a botocore Config with short timeouts and few retries for a service.
+
+    botocore defaults to 60 second timeouts with retries, which outlasts the
+    Lambda timeout so a hung call would never reach the circuit breaker. Values
+    are read from CIRCUIT_BREAKER_[<SERVICE>_]CONNECT_TIMEOUT, READ_TIMEOUT and
+    MAX_ATTEMPTS environment variables.
+
+    Parameters:
+        service_name (str): The protected service, e.g. "rekognition".
+    """
+    return Config(
+        connect_timeout=_setting(service_name, "CONNECT_TIMEOUT", 2.0, float),
+        read_timeout=_setting(service_name, "READ_TIMEOUT", 5.0, float),
+        retries={
+            "total_max_attempts": _setting(service_name, "MAX_ATTEMPTS", 2, int),
+            "mode": "standard",
+        },
+    )
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name,
+        failure_rate_threshold=0.5,
+        minimum_calls=5,
+        window_size=20,
+        reset_timeout=30.0,
+        clock=time.monotonic,
+    ):
+        """
+        Initialize a circuit breaker tracking the error rate of one service.
+
+        Parameters:
+            name (str): The name of the protected service, used in logs.
+            failure_rate_threshold (float): Error rate (0-1) that opens the circuit.
+            minimum_calls (int): Calls required in the window before tripping.
+            window_size (int): Number of most recent calls considered.
+            reset_timeout (float): Seconds to stay open before a half-open trial.
+            clock (callable): Monotonic time source, overridable for tests.
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        Return the current state, moving from open to half-open once the
+        reset timeout has elapsed.
+        """
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self):
+        if self._state != OPEN:
+            return
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            logger.info("Circuit breaker '%s' is half-open.", self.name)
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow_request(self):
+        """
+        Check whether a call to the service should be attempted.
+
+        Returns:
+            bool: True when closed, or for the single trial call while half-open.
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Record a successful call, closing the circuit after a half-open trial.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info("Circuit breaker '%s' closed after trial call.", self.name)
+                self._state = CLOSED
+                self._outcomes.clear()
+                self._trial_in_flight = False
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """
+        Record a failed call, opening the circuit if the error rate is exceeded
+        or if a half-open trial call fails.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            calls = len(self._outcomes)
+            if calls < self.minimum_calls:
+                return
+            failure_rate = self._outcomes.count(False) / calls
+            if self._state == CLOSED and failure_rate >= self.failure_rate_threshold:
+                self._open()
+
+    def _open(self):
+        logger.warning(
+            "Circuit breaker '%s' opened; failing fast for %s seconds.",
+            self.name,
+            self.reset_timeout,
+        )
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._trial_in_flight = False
+
+
+def get_circuit_breaker(service_name):
+    """
+    Return the shared circuit breaker for a service, creating it on first use.
+
+    Thresholds are read from CIRCUIT_BREAKER_[<SERVICE>_]FAILURE_RATE,
+    MINIMUM_CALLS, WINDOW_SIZE and RESET_TIMEOUT environment variables.
+
+    Parameters:
+        service_name (str): The protected service, e.g. "rekognition".
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(service_name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                service_name,
+                failure_rate_threshold=_setting(
+                    service_name, "FAILURE_RATE", 0.5, float
+                ),
+                minimum_calls=_setting(service_name, "MINIMUM_CALLS", 5, int),
+                window_size=_setting(service_name, "WINDOW_SIZE", 20, int),
+                reset_timeout=_setting(service_name, "RESET_TIMEOUT", 30.0, float),
+            )
+            _breakers[service_name] = breaker
+        return breaker
+
+
+def reset_circuit_breakers():
+    """
+    Discard all shared circuit breakers, e.g. between tests.
+    """
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,115 @@
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+
+import boto3
+from utils.circuit_breaker import client_config, get_circuit_breaker, is_transient_error
+
+logger = logging.getLogger()
+
+aws_region = os.getenv("AWS_REGION", "us-east-1")
+dynamodb = boto3.resource(
+    "dynamodb", region_name=aws_region, config=client_config("dynamodb")
+)
+
+# Frames uploaded by the synchronous detection API are stored under this
+# prefix and already analysed, so the S3-triggered handler skips them.
+SYNC_FRAME_PREFIX = os.getenv("SYNC_FRAME_PREFIX", "sync/")
+
+# Metadata writes queued while DynamoDB is unavailable, retried on later
+# records and warm invocations once the circuit allows calls again. The queue
+# is bounded; the S3-triggered handler fails the invocation while writes are
+# still queued so Lambda's retries and DLQ keep the event.
+MAX_QUEUED_WRITES = int(os.getenv("MAX_QUEUED_WRITES", "100"))
+_queued_writes = deque()
+
+
+# Recursive function to convert floats to Decimal
+def convert_to_decimal(data):
+    if isinstance(data, list):
+        return [convert_to_decimal(item) for item in data]
+    elif isinstance(data, dict):
+        return {key: convert_to_decimal(value) for key, value in data.items()}
+    elif isinstance(data, float):
+        return Decimal(str(data))  # Convert float to Decimal
+    else:
+        return data
+
+
+# Helper function to save metadata to DynamoDB
+def save_frame_metadata(
+    bucket, key, size, plants_detected, plant_labels, needs_reprocessing=False
+):
+    table_name = os.getenv("DYNAMODB_TABLE_NAME")
+    if not table_name:
+        logger.error("DYNAMODB_TABLE_NAME environment variable is not set.")
+        raise ValueError("DYNAMODB_TABLE_NAME environment variable is required.")
+
+    frame_id = f"{bucket}/{key}"
+    timestamp = datetime.utcnow().isoformat()
+
+    item = {
+        "frame_id": frame_id,
+        "bucket": bucket,
+        "key": key,
+        "size": size,
+        "plants_detected": plants_detected,
+        "plant_labels": plant_labels,
+        "needs_reprocessing": needs_reprocessing,
+        "timestamp": timestamp,
+    }
+
+    # Convert all float values in the item to Decimal
+    item = convert_to_decimal(item)
+    if len(_queued_writes) >= MAX_QUEUED_WRITES:
+        logger.error("DynamoDB write queue is full; cannot save %s.", frame_id)
+        raise RuntimeError("DynamoDB write queue is full.")
+    # Queue behind any earlier writes so an outage never reorders them
+    _queued_writes.append((table_name, item))
+    flush_queued_writes()
+
+
+# Helper function to retry metadata writes queued during a DynamoDB outage
+def flush_queued_writes():
+    breaker = get_circuit_breaker("dynamodb")
+    written = 0
+    while _queued_writes and breaker.allow_request():
+        # A permanent error raises with the item already dropped from the queue
+        table_name, item = _queued_writes.popleft()
+        if not _put_item(table_name, item):
+            _queued_writes.appendleft((table_name, item))
+            break
+        written += 1
+    if _queued_writes:
+        logger.warning("DynamoDB unavailable; %d write(s) queued.", len(_queued_writes))
+    return written
+
+
+# Helper function returning the number of writes waiting for DynamoDB
+def queued_count():
+    return len(_queued_writes)
+
+
+def _put_item(table_name, item):
+    """
+    Write one item, returning False on a transient error so it can be queued
+    again. Permanent errors, such as a missing table or an invalid item, are
+    raised so the invocation fails instead of blocking the queue.
+    """
+    breaker = get_circuit_breaker("dynamodb")
+    table = dynamodb.Table(table_name)  # Initialize table dynamically
+    try:
+        table.put_item(Item=item)
+        breaker.record_success()
+        logger.info("Frame metadata saved to DynamoDB: %s", item)
+        return True
+    except Exception as e:
+        if is_transient_error(e):
+            breaker.record_failure()
+            logger.error("DynamoDB unavailable while saving metadata: %s", e)
+            return False
+        breaker.record_success()  # DynamoDB answered; the item itself is bad
+        logger.error("Error saving metadata to DynamoDB: %s", e)
+        raise
@@ -1,52 +1,137 @@
 import logging
 import os
+from collections import deque
 
 import boto3
+from utils.circuit_breaker import client_config, get_circuit_breaker, is_transient_error
 
 logger = logging.getLogger()
 
+# Notifications that could not be published while SNS was unavailable. Kept at
+# module level so they carry over to the next warm invocation. Deferral is
+# best-effort: the queue is bounded and lost when the container is recycled.
+MAX_DEFERRED_NOTIFICATIONS = int(os.getenv("MAX_DEFERRED_NOTIFICATIONS", "100"))
+_deferred_notifications = deque()
+
+
+def _defer(notification):
+    if len(_deferred_notifications) >= MAX_DEFERRED_NOTIFICATIONS:
+        logger.error(
+            "Deferred notification queue is full; dropping notification for '%s'.",
+            notification[1],
+        )
+        return
+    _deferred_notifications.append(notification)
+
 
 class NotificationService:
-    def __init__(self):
+    def __init__(self, config=None):
         """
         Initialize the NotificationService with an SNS client and topic ARN.
+
+        Parameters:
+            config (dict): Camera configuration whose "sns_topic_arn" overrides
+                the SNS_TOPIC_ARN environment variable.
         """
         aws_region = os.getenv("AWS_REGION", "us-east-1")  # Default to us-east-1
-        self.sns_client = boto3.client("sns", region_name=aws_region)
-        self.topic_arn = os.getenv("SNS_TOPIC_ARN")
+        self.sns_client = boto3.client(
+            "sns", region_name=aws_region, config=client_config("sns")
+        )
+        self.topic_arn = (config or {}).get("sns_topic_arn") or os.getenv(
+            "SNS_TOPIC_ARN"
+        )
+        self.circuit_breaker = get_circuit_breaker("sns")
+        self._last_error_transient = False
 
     def send_notification(self, object_key, plants_detected):
         """
         Send an SNS notification with the count of plants detected in an image.
 
+        The notification is deferred instead of sent when the SNS circuit is
+        open or the publish fails because SNS is unavailable. Permanent
+        errors, such as a missing topic or a denied publish, are logged and the
+        notification is dropped.
+
         Parameters:
             object_key (str): The S3 object key for the processed image.
             plants_detected (int): The number of plants detected in the image.
+
+        Returns:
+            bool: True if the notification was published.
         """
         if plants_detected > 0:
-            message = (
-                f"{plants_detected} plant(s) detected in image '{object_key}'. "
-                "You can check the detailed analysis in the system."
-            )
-            try:
-                # Publish the message to the SNS topic
-                response = self.sns_client.publish(
-                    TopicArn=self.topic_arn,
-                    Message=message,
-                    Subject="Plant Detection Alert",
-                )
-                logger.info(
-                    "SNS notification sent successfully for '%s'. SNS response: %s",
+            if not self.circuit_breaker.allow_request():
+                logger.warning(
+                    "SNS circuit is open; deferring notification for '%s'.",
                     object_key,
-                    response,
                 )
-            except self.sns_client.exceptions.EndpointDisabledException as e:
-                logger.error("SNS endpoint is disabled: %s", e)
-            except self.sns_client.exceptions.InvalidParameterException as e:
-                logger.error("Invalid parameter when sending SNS notification: %s", e)
-            except Exception as e:
-                logger.error("Error in sending SNS notification: %s", e)
+                _defer((self.topic_arn, object_key, plants_detected))
+                return False
+            if self._publish(self.topic_arn, object_key, plants_detected):
+                return True
+            if self._last_error_transient:
+                _defer((self.topic_arn, object_key, plants_detected))
+            return False
         else:
             logger.info(
                 "No plants detected in image '%s'. No notification sent.", object_key
             )
+            return False
+
+    def flush_deferred_notifications(self):
+        """
+        Retry deferred notifications while the SNS circuit allows calls.
+
+        Returns:
+            int: The number of deferred notifications published.
+        """
+        sent = 0
+        while _deferred_notifications and self.circuit_breaker.allow_request():
+            notification = _deferred_notifications.popleft()
+            if self._publish(*notification):
+                sent += 1
+            elif self._last_error_transient:
+                _deferred_notifications.appendleft(notification)
+                break
+            # Permanent failures are dropped rather than retried
+        if _deferred_notifications:
+            logger.warning(
+                "%d SNS notification(s) still deferred.", len(_deferred_notifications)
+            )
+        return sent
+
+    def _publish(self, topic_arn, object_key, plants_detected):
+        self._last_error_transient = False
+        message = (
+            f"{plants_detected} plant(s) detected in image '{object_key}'. "
+            "You can check the detailed analysis in the system."
+        )
+        try:
+            # Publish the message to the SNS topic
+            response = self.sns_client.publish(
+                TopicArn=topic_arn,
+                Message=message,
+                Subject="Plant Detection Alert",
+            )
+            self.circuit_breaker.record_success()
+            logger.info(
+                "SNS notification sent successfully for '%s'. SNS response: %s",
+                object_key,
+                response,
+            )
+            return True
+        except self.sns_client.exceptions.EndpointDisabledException as e:
+            self.circuit_breaker.record_success()
+            logger.error("SNS endpoint is disabled: %s", e)
+        except self.sns_client.exceptions.InvalidParameterException as e:
+            self.circuit_breaker.record_success()
+            logger.error("Invalid parameter when sending SNS notification: %s", e)
+        except Exception as e:
+            if is_transient_error(e):
+                self.circuit_breaker.record_failure()
+                self._last_error_transient = True
+                logger.error("SNS unavailable, deferring notification: %s", e)
+            else:
+                self.circuit_breaker.record_success()  # SNS answered
+                logger.error("Error in sending SNS notification: %s", e)
+        return False
@@ -3,126 +3,243 @@ import os
 
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
+from utils.camera_config import default_camera_config
+from utils.circuit_breaker import client_config, get_circuit_breaker, is_transient_error
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 
 class PlantDetector:
-    def __init__(self, bucket_name, object_key):
+    def __init__(self, bucket_name, object_key, config=None, image_bytes=None):
         """
         Initialize PlantDetector with S3 bucket and object key.
+
+        Parameters:
+            bucket_name (str): The S3 bucket holding the frame.
+            object_key (str): The S3 object key of the frame.
+            config (dict): Camera configuration with thresholds, plant labels
+                and ROI. Defaults to the global configuration.
+            image_bytes (bytes): Raw image to analyse instead of reading the
+                object back from S3.
         """
         self.bucket_name = bucket_name
         self.object_key = object_key
+        self.image_bytes = image_bytes
+        self.config = config or default_camera_config()
         aws_region = os.getenv("AWS_REGION", "us-east-1")  # Default to us-east-1
-        self.rekognition_client = boto3.client("rekognition", region_name=aws_region)
+        self.rekognition_client = boto3.client(
+            "rekognition", region_name=aws_region, config=client_config("rekognition")
+        )
+        self.circuit_breaker = get_circuit_breaker("rekognition")
 
     def detect(self):
         """
         Detect if a plant is present in the image using Rekognition.
+
+        Cameras with a configuration entry use their own thresholds and plant
+        labels; otherwise the original 10 labels at 80% confidence are checked
+        for "plant" only.
         """
+        if self.config.get("prefix"):
+            max_labels = self.config["max_labels"]
+            min_confidence = self.config["min_confidence"]
+            plant_labels = self.config["plant_labels"]
+        else:
+            max_labels, min_confidence, plant_labels = 10, 80, ["plant"]
+
+        if not self.circuit_breaker.allow_request():
+            logger.warning(
+                "Rekognition circuit is open; skipping detection for '%s'.",
+                self.object_key,
+            )
+            return False
         try:
             response = self.rekognition_client.detect_labels(
-                Image={
-                    "S3Object": {"Bucket": self.bucket_name, "Name": self.object_key}
-                },
-                MaxLabels=10,
-                MinConfidence=80,
+                Image=self._image(),
+                MaxLabels=max_labels,
+                MinConfidence=min_confidence,
             )
-            logger.info("Rekognition response: %s", response)
-
-            # Check for "Plant" in the detected labels
-            for label in response.get("Labels", []):
-                if label["Name"].lower() == "plant":
-                    logger.info("Plant detected in Rekognition labels.")
-                    return True
-            logger.info("No plant found in Rekognition labels.")
-            return False
         except (ClientError, BotoCoreError) as e:
+            if is_transient_error(e):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()  # Rekognition answered
             logger.error("Error in Rekognition detect_labels: %s", e)
             return False
+        except Exception as e:
+            self.circuit_breaker.record_failure()
+            logger.error("Unexpected error in Rekognition detect_labels: %s", e)
+            return False
+
+        # Rekognition answered; errors past this point are ours, not an outage
+        self.circuit_breaker.record_success()
+        logger.info("Rekognition response: %s", response)
+
+        # Check for a plant-related label in the detected labels
+        for label in response.get("Labels", []):
+            if label.get("Name", "").lower() in plant_labels:
+                logger.info("Plant detected in Rekognition labels.")
+                return True
+        logger.info("No plant found in Rekognition labels.")
+        return False
 
     def detect_multiple(self):
         """
         Detect multiple plant-related labels in the image and count the total instances.
 
         Returns:
-            list: A list of plant-related labels and the total count of plant instances.
+            dict: Plant-related labels, the total count of plant instances and a
+            "reprocess" flag set when Rekognition was unavailable and the frame
+            should be analysed again later. "invalid_image" is set when
+            Rekognition rejects the image format or size.
         """
+        if not self.circuit_breaker.allow_request():
+            logger.warning(
+                "Rekognition circuit is open; marking '%s' for reprocessing.",
+                self.object_key,
+            )
+            return {"labels": [], "total_instances": 0, "reprocess": True}
+
         try:
             # Call Rekognition to detect labels
             response = self.rekognition_client.detect_labels(
-                Image={
-                    "S3Object": {"Bucket": self.bucket_name, "Name": self.object_key}
-                },
-                MaxLabels=50,  # Increased for comprehensive detection
-                MinConfidence=70,  # Adjusted threshold for better coverage
-            )
-            logger.info(
-                "Rekognition response for image '%s': %s", self.object_key, response
+                Image=self._image(),
+                MaxLabels=self.config["max_labels"],
+                MinConfidence=self.config["min_confidence"],
             )
-
-            # Extract plant-related labels
-            plant_labels = []
-            total_instances = 0
-
-            for label in response.get("Labels", []):
-                # Check if the label is plant-related
-                if label["Name"].lower() in [
-                    "plant",
-                    "leaf",
-                    "potted plant",
-                    "herbs",
-                    "herbal",
-                ]:
-                    plant_labels.append(
-                        {
-                            "Name": label["Name"],
-                            "Confidence": label["Confidence"],
-                            "Instances": len(
-                                label.get("Instances", [])
-                            ),  # Count bounding boxes (plants)
-                        }
-                    )
-                    # Sum up all bounding box instances
-                    total_instances += len(label.get("Instances", []))
-
-            logger.info("Detected plant-related labels: %s", plant_labels)
-            logger.info("Total plant instances detected: %d", total_instances)
-
-            return {"labels": plant_labels, "total_instances": total_instances}
-
         except self.rekognition_client.exceptions.InvalidS3ObjectException as e:
+            self.circuit_breaker.record_success()
             logger.error("Invalid S3 object for image '%s': %s", self.object_key, e)
-            return {"labels": [], "total_instances": 0}
+            return {"labels": [], "total_instances": 0, "reprocess": False}
 
         except self.rekognition_client.exceptions.InvalidParameterException as e:
+            self.circuit_breaker.record_success()
             logger.error(
                 "Invalid parameter passed for image '%s': %s", self.object_key, e
             )
-            return {"labels": [], "total_instances": 0}
+            return {"labels": [], "total_instances": 0, "reprocess": False}
+
+        except (
+            self.rekognition_client.exceptions.InvalidImageFormatException,
+            self.rekognition_client.exceptions.ImageTooLargeException,
+        ) as e:
+            # A bad upload is the client's fault, not a Rekognition outage
+            self.circuit_breaker.record_success()
+            logger.error("Invalid image '%s': %s", self.object_key, e)
+            return {
+                "labels": [],
+                "total_instances": 0,
+                "reprocess": False,
+                "invalid_image": True,
+            }
 
         except self.rekognition_client.exceptions.AccessDeniedException as e:
+            self.circuit_breaker.record_success()
             logger.error(
                 "Access denied for Rekognition or S3 object '%s': %s",
                 self.object_key,
                 e,
             )
-            return {"labels": [], "total_instances": 0}
+            return {"labels": [], "total_instances": 0, "reprocess": False}
 
         except (ClientError, BotoCoreError) as e:
+            # Only outages count against the breaker and flag the frame
+            transient = is_transient_error(e)
+            if transient:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
             logger.error(
                 "General error in Rekognition detect_labels for '%s': %s",
                 self.object_key,
                 e,
             )
-            return {"labels": [], "total_instances": 0}
+            return {"labels": [], "total_instances": 0, "reprocess": transient}
 
         except Exception as e:
+            self.circuit_breaker.record_failure()
             logger.error(
                 "Unexpected error in Rekognition detect_labels for '%s': %s",
                 self.object_key,
                 e,
             )
-            return {"labels": [], "total_instances": 0}
+            return {"labels": [], "total_instances": 0, "reprocess": True}
+
+        # Rekognition answered; errors past this point are ours, not an outage
+        self.circuit_breaker.record_success()
+        logger.info(
+            "Rekognition response for image '%s': %s", self.object_key, response
+        )
+        try:
+            return self._plant_labels(response)
+        except Exception as e:
+            logger.error(
+                "Error reading Rekognition response for '%s': %s", self.object_key, e
+            )
+            return {"labels": [], "total_instances": 0, "reprocess": False}
+
+    def _plant_labels(self, response):
+        """
+        Extract the plant-related labels inside the ROI and count their instances.
+
+        Parameters:
+            response (dict): The Rekognition detect_labels response.
+        """
+        plant_labels = []
+        total_instances = 0
+
+        for label in response.get("Labels", []):
+            # Check if the label is plant-related
+            if label["Name"].lower() in self.config["plant_labels"]:
+                instances = self._instances_in_roi(label.get("Instances", []))
+                if label.get("Instances") and not instances:
+                    continue  # All bounding boxes fall outside the ROI
+                plant_labels.append(
+                    {
+                        "Name": label["Name"],
+                        "Confidence": label["Confidence"],
+                        "Instances": len(instances),  # Count bounding boxes
+                    }
+                )
+                # Sum up all bounding box instances
+                total_instances += len(instances)
+
+        logger.info("Detected plant-related labels: %s", plant_labels)
+        logger.info("Total plant instances detected: %d", total_instances)
+
+        return {
+            "labels": plant_labels,
+            "total_instances": total_instances,
+            "reprocess": False,
+        }
+
+    def _image(self):
+        """
+        Build the Rekognition Image argument from the raw bytes or S3 object.
+        """
+        if self.image_bytes is not None:
+            return {"Bytes": self.image_bytes}
+        return {"S3Object": {"Bucket": self.bucket_name, "Name": self.object_key}}
+
+    def _instances_in_roi(self, instances):
+        """
+        Keep the instances whose bounding box centre lies inside the camera ROI.
+
+        Parameters:
+            instances (list): Rekognition label instances with bounding boxes.
+        """
+        roi = self.config.get("roi")
+        if not roi:
+            return instances
+
+        kept = []
+        for instance in instances:
+            box = instance.get("BoundingBox", {})
+            centre_x = box.get("Left", 0) + box.get("Width", 0) / 2
+            centre_y = box.get("Top", 0) + box.get("Height", 0) / 2
+            inside_x = roi["Left"] <= centre_x <= roi["Left"] + roi["Width"]
+            inside_y = roi["Top"] <= centre_y <= roi["Top"] + roi["Height"]
+            if inside_x and inside_y:
+                kept.append(instance)
+        return kept
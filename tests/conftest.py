@@ -19,3 +19,21 @@ def set_mocked_aws_credentials():
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../lambda_functions"))
 )
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_state():
+    """Reset state shared across warm invocations between tests."""
+    from utils import metadata, notifications
+    from utils.camera_config import reset_camera_config_store
+    from utils.circuit_breaker import reset_circuit_breakers
+
+    def reset():
+        reset_circuit_breakers()
+        reset_camera_config_store()
+        metadata._queued_writes.clear()
+        notifications._deferred_notifications.clear()
+
+    reset()
+    yield
+    reset()
@@ -0,0 +1,207 @@
+from decimal import Decimal
+
+import boto3
+import pytest
+from moto import mock_aws
+from utils.camera_config import CameraConfigStore, get_camera_config
+from utils.circuit_breaker import CLOSED, get_circuit_breaker
+from utils.rekognition import PlantDetector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def config_table():
+    """
+    Mocked camera configuration table keyed by S3 key prefix.
+    """
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = dynamodb.create_table(
+            TableName="CameraConfigTable",
+            KeySchema=[{"AttributeName": "prefix", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "prefix", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        table.put_item(
+            Item={
+                "prefix": "greenhouse/",
+                "min_confidence": Decimal("85"),
+                "sns_topic_arn": "arn:aws:sns:us-east-1:123456789012:greenhouse",
+            }
+        )
+        table.put_item(
+            Item={
+                "prefix": "greenhouse/cam-2/",
+                "max_labels": Decimal("20"),
+                "plant_labels": ["Tree"],
+            }
+        )
+        yield table
+
+
+def test_defaults_without_table(monkeypatch):
+    monkeypatch.delenv("CAMERA_CONFIG_TABLE_NAME", raising=False)
+    monkeypatch.setenv("SNS_TOPIC_ARN", "arn:aws:sns:us-east-1:123456789012:default")
+
+    config = get_camera_config("any/frame.jpg")
+    assert config["min_confidence"] == 70.0
+    assert config["max_labels"] == 50
+    assert config["sns_topic_arn"].endswith(":default")
+
+
+def test_longest_prefix_wins(config_table, monkeypatch):
+    monkeypatch.setenv(
+        "CAMERA_SNS_TOPIC_ARN_PREFIX", "arn:aws:sns:us-east-1:123456789012:green"
+    )
+    store = CameraConfigStore("CameraConfigTable")
+
+    greenhouse = store.get("greenhouse/cam-1/frame.jpg")
+    assert greenhouse["min_confidence"] == 85.0
+    assert greenhouse["sns_topic_arn"].endswith(":greenhouse")
+
+    camera = store.get("greenhouse/cam-2/frame.jpg")
+    assert camera["max_labels"] == 20
+    assert camera["plant_labels"] == ["tree"]
+
+    assert store.get("outdoor/frame.jpg")["prefix"] == ""
+
+
+def test_invalid_rows_and_topics_skipped(config_table, monkeypatch):
+    monkeypatch.setenv("SNS_TOPIC_ARN", "arn:aws:sns:us-east-1:123456789012:default")
+    monkeypatch.setenv(
+        "CAMERA_SNS_TOPIC_ARN_PREFIX", "arn:aws:sns:us-east-1:123456789012:plant-"
+    )
+    config_table.put_item(Item={"prefix": "broken/", "roi": {"Left": Decimal("0.1")}})
+    config_table.put_item(Item={"prefix": "greenhouse/cam-3/", "max_labels": 0})
+    store = CameraConfigStore("CameraConfigTable")
+
+    assert store.get("broken/frame.jpg")["roi"] is None
+    assert store.get("greenhouse/cam-3/frame.jpg")["max_labels"] == 50
+    # The role cannot publish to this topic, so the default one is kept
+    greenhouse = store.get("greenhouse/cam-1/frame.jpg")
+    assert greenhouse["min_confidence"] == 85.0
+    assert greenhouse["sns_topic_arn"].endswith(":default")
+
+
+@pytest.mark.parametrize("plant_labels", ["plant", {"Name": "plant"}])
+def test_plant_labels_must_be_a_list(config_table, plant_labels):
+    config_table.put_item(Item={"prefix": "labels/", "plant_labels": plant_labels})
+    config_table.put_item(Item={"prefix": "set/", "plant_labels": {"Fern", "Moss"}})
+    store = CameraConfigStore("CameraConfigTable")
+
+    assert store.get("labels/frame.jpg")["prefix"] == ""
+    assert sorted(store.get("set/frame.jpg")["plant_labels"]) == ["fern", "moss"]
+
+
+@pytest.mark.parametrize(
+    "value, expected", [("120", 120.0), ("soon", 300.0), ("-5", 300.0)]
+)
+def test_ttl_read_from_env(monkeypatch, value, expected):
+    monkeypatch.setenv("CAMERA_CONFIG_TTL_SECONDS", value)
+    assert CameraConfigStore().ttl_seconds == expected
+
+
+def test_cached_until_ttl_expires(config_table):
+    clock = FakeClock()
+    store = CameraConfigStore("CameraConfigTable", ttl_seconds=60, clock=clock)
+    assert store.get("greenhouse/frame.jpg")["min_confidence"] == 85.0
+
+    config_table.put_item(Item={"prefix": "greenhouse/", "min_confidence": 90})
+    clock.now = 30
+    assert store.get("greenhouse/frame.jpg")["min_confidence"] == 85.0
+
+    # Stale config is served while the background refresh runs
+    clock.now = 60
+    assert store.get("greenhouse/frame.jpg")["min_confidence"] == 85.0
+    store._refresh_thread.join()
+    assert store.get("greenhouse/frame.jpg")["min_confidence"] == 90.0
+
+
+def test_failed_load_caches_defaults_until_ttl_expires():
+    with mock_aws():
+        clock = FakeClock()
+        store = CameraConfigStore("MissingTable", ttl_seconds=60, clock=clock)
+        scans = []
+        original_scan = store.table.scan
+        store.table.scan = lambda **kwargs: scans.append(kwargs) or original_scan(
+            **kwargs
+        )
+
+        for _ in range(3):
+            assert store.get("greenhouse/frame.jpg")["prefix"] == ""
+        assert len(scans) == 1
+        # A missing table is a deployment problem, not a DynamoDB outage
+        assert get_circuit_breaker("camera_config").state == CLOSED
+
+        clock.now = 60
+        store.get("greenhouse/frame.jpg")
+        store._refresh_thread.join()
+        assert len(scans) == 2
+
+
+def test_detector_uses_camera_thresholds_and_roi(monkeypatch):
+    config = get_camera_config("cam/frame.jpg")
+    config["min_confidence"] = 90.0
+    config["roi"] = {"Left": 0.0, "Top": 0.0, "Width": 0.5, "Height": 0.5}
+    detector = PlantDetector("bucket", "cam/frame.jpg", config)
+
+    def detect_labels(**kwargs):
+        assert kwargs["MinConfidence"] == 90.0
+        box = {"Width": 0.1, "Height": 0.1}
+        return {
+            "Labels": [
+                {
+                    "Name": "Plant",
+                    "Confidence": 95.0,
+                    "Instances": [
+                        {"BoundingBox": dict(box, Left=0.1, Top=0.1)},
+                        {"BoundingBox": dict(box, Left=0.8, Top=0.8)},
+                    ],
+                },
+                {
+                    "Name": "Leaf",
+                    "Confidence": 92.0,
+                    "Instances": [{"BoundingBox": dict(box, Left=0.7, Top=0.1)}],
+                },
+            ]
+        }
+
+    monkeypatch.setattr(detector.rekognition_client, "detect_labels", detect_labels)
+
+    result = detector.detect_multiple()
+    assert result["total_instances"] == 1
+    assert [label["Name"] for label in result["labels"]] == ["Plant"]
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        (None, (10, 80, False)),
+        (
+            {"prefix": "cam/", "max_labels": 20, "min_confidence": 60.0},
+            (20, 60.0, True),
+        ),
+    ],
+)
+def test_detect_keeps_defaults_without_camera_override(monkeypatch, config, expected):
+    if config:
+        config = dict(get_camera_config("cam/frame.jpg"), **config)
+    detector = PlantDetector("bucket", "cam/frame.jpg", config)
+    calls = []
+
+    def detect_labels(**kwargs):
+        calls.append((kwargs["MaxLabels"], kwargs["MinConfidence"]))
+        return {"Labels": [{"Name": "Leaf", "Confidence": 90.0}]}
+
+    monkeypatch.setattr(detector.rekognition_client, "detect_labels", detect_labels)
+
+    max_labels, min_confidence, leaf_counts = expected
+    assert detector.detect() is leaf_counts
+    assert calls == [(max_labels, min_confidence)]
@@ -0,0 +1,189 @@
+from collections import deque
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+from utils import circuit_breaker, notifications
+from utils.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from utils.notifications import NotificationService
+from utils.rekognition import PlantDetector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_opens_when_error_rate_exceeded(clock):
+    breaker = CircuitBreaker(
+        "test", failure_rate_threshold=0.5, minimum_calls=4, clock=clock
+    )
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = CircuitBreaker("test", minimum_calls=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker("test", minimum_calls=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 15
+    assert not breaker.allow_request()
+
+
+def test_shared_breaker_reads_environment(monkeypatch):
+    monkeypatch.setenv("CIRCUIT_BREAKER_MINIMUM_CALLS", "3")
+    monkeypatch.setenv("CIRCUIT_BREAKER_SNS_MINIMUM_CALLS", "7")
+
+    assert get_circuit_breaker("sns").minimum_calls == 7
+    assert get_circuit_breaker("dynamodb").minimum_calls == 3
+    assert get_circuit_breaker("sns") is get_circuit_breaker("sns")
+
+
+def test_notification_deferred_while_circuit_open(monkeypatch):
+    monkeypatch.setattr(notifications, "_deferred_notifications", deque())
+    breaker = get_circuit_breaker("sns")
+    for _ in range(breaker.minimum_calls):
+        breaker.record_failure()
+
+    notifier = NotificationService()
+    published = []
+    monkeypatch.setattr(
+        notifier.sns_client, "publish", lambda **kwargs: published.append(kwargs)
+    )
+
+    assert not notifier.send_notification("frame.jpg", 2)
+    assert list(notifications._deferred_notifications) == [
+        (notifier.topic_arn, "frame.jpg", 2)
+    ]
+    assert published == []
+
+    breaker.reset_timeout = 0  # let the next call through as a half-open trial
+    assert notifier.flush_deferred_notifications() == 1
+    assert len(published) == 1
+    assert not notifications._deferred_notifications
+
+
+def _client_error(code, status):
+    return ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "Operation",
+    )
+
+
+def test_transient_error_classification():
+    assert circuit_breaker.is_transient_error(_client_error("ThrottlingException", 400))
+    assert circuit_breaker.is_transient_error(_client_error("InternalError", 500))
+    assert circuit_breaker.is_transient_error(
+        EndpointConnectionError(endpoint_url="https://aws")
+    )
+    assert not circuit_breaker.is_transient_error(
+        _client_error("ResourceNotFoundException", 400)
+    )
+    assert not circuit_breaker.is_transient_error(
+        _client_error("AuthorizationError", 403)
+    )
+    assert not circuit_breaker.is_transient_error(ValueError("not an AWS error"))
+
+
+def test_permanent_sns_error_dropped_without_tripping(monkeypatch):
+    monkeypatch.setattr(notifications, "_deferred_notifications", deque())
+    notifier = NotificationService()
+
+    def publish(**kwargs):
+        raise _client_error("AuthorizationError", 403)
+
+    monkeypatch.setattr(notifier.sns_client, "publish", publish)
+
+    for _ in range(10):
+        assert not notifier.send_notification("frame.jpg", 1)
+    assert not notifications._deferred_notifications
+    assert get_circuit_breaker("sns").allow_request()
+
+
+def test_clients_use_short_timeouts(monkeypatch):
+    monkeypatch.setenv("CIRCUIT_BREAKER_REKOGNITION_READ_TIMEOUT", "3")
+    detector = PlantDetector("bucket", "frame.jpg")
+
+    config = detector.rekognition_client.meta.config
+    assert config.read_timeout == 3
+    assert config.connect_timeout == 2
+    assert config.retries["total_max_attempts"] == 2
+
+
+def test_timeout_counts_as_failure(monkeypatch):
+    detector = PlantDetector("bucket", "frame.jpg")
+
+    def detect_labels(**kwargs):
+        raise ReadTimeoutError(endpoint_url="https://rekognition")
+
+    monkeypatch.setattr(detector.rekognition_client, "detect_labels", detect_labels)
+
+    breaker = get_circuit_breaker("rekognition")
+    for _ in range(breaker.minimum_calls):
+        assert detector.detect_multiple()["reprocess"] is True
+    assert breaker.state == "open"
+
+
+def test_deferred_notifications_are_bounded(monkeypatch):
+    monkeypatch.setattr(notifications, "_deferred_notifications", deque())
+    monkeypatch.setattr(notifications, "MAX_DEFERRED_NOTIFICATIONS", 2)
+    breaker = get_circuit_breaker("sns")
+    for _ in range(breaker.minimum_calls):
+        breaker.record_failure()
+
+    notifier = NotificationService()
+    for index in range(3):
+        notifier.send_notification(f"frame-{index}.jpg", 1)
+
+    assert [item[1] for item in notifications._deferred_notifications] == [
+        "frame-0.jpg",
+        "frame-1.jpg",
+    ]
+
+
+def test_response_parsing_error_is_not_an_outage(monkeypatch):
+    detector = PlantDetector("bucket", "frame.jpg")
+    monkeypatch.setattr(
+        detector.rekognition_client,
+        "detect_labels",
+        lambda **kwargs: {"Labels": [{"Confidence": 99.0}]},  # no "Name"
+    )
+
+    breaker = get_circuit_breaker("rekognition")
+    for _ in range(breaker.minimum_calls):
+        result = detector.detect_multiple()
+        assert result["reprocess"] is False
+        assert result["labels"] == []
+    assert breaker.state == "closed"
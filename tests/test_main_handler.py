@@ -2,7 +2,10 @@ import json
 
 import boto3
 import pytest
+from botocore.exceptions import ClientError
 from moto import mock_aws
+from utils import metadata, notifications
+from utils.circuit_breaker import get_circuit_breaker
 from utils.rekognition import PlantDetector
 
 from lambda_functions.main_handler import handler
@@ -101,3 +104,123 @@ def test_handler(s3_event, setup_environment, monkeypatch):
     assert (
         stored_items[0]["plants_detected"] == 1
     )  # Based on mocked Rekognition response
+
+
+def test_handler_skips_detection_api_frames(monkeypatch):
+    """
+    Frames uploaded by the synchronous detection API are not analysed twice.
+    """
+
+    def fail_detect_multiple(self):
+        raise AssertionError("detect_multiple should not be called")
+
+    monkeypatch.setattr(PlantDetector, "detect_multiple", fail_detect_multiple)
+    monkeypatch.setattr(
+        "lambda_functions.main_handler.cloudwatch.put_metric_data",
+        lambda **kwargs: None,
+    )
+
+    event = {
+        "Records": [
+            {
+                "s3": {
+                    "bucket": {"name": "test-bucket"},
+                    "object": {"key": "sync/cam-1/frame.jpg"},
+                }
+            }
+        ]
+    }
+    response = handler(event, None)
+    assert response["statusCode"] == 200
+
+
+@pytest.fixture
+def frame_table(setup_environment):
+    """
+    Mocked DynamoDB table and SNS topic for handler fallback tests.
+    """
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = dynamodb.create_table(
+            TableName="TestTable",
+            KeySchema=[{"AttributeName": "frame_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "frame_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
+
+
+def _open_circuit(service_name):
+    breaker = get_circuit_breaker(service_name)
+    for _ in range(breaker.minimum_calls):
+        breaker.record_failure()
+    return breaker
+
+
+def _event(key):
+    return {
+        "Records": [{"s3": {"bucket": {"name": "test-bucket"}, "object": {"key": key}}}]
+    }
+
+
+def test_open_rekognition_circuit_marks_frame_for_reprocessing(frame_table):
+    _open_circuit("rekognition")
+
+    response = handler(_event("test-image.jpg"), None)
+
+    assert response["statusCode"] == 200
+    item = frame_table.get_item(Key={"frame_id": "test-bucket/test-image.jpg"})
+    assert item["Item"]["needs_reprocessing"] is True
+
+
+def test_open_dynamodb_circuit_queues_write_until_recovery(frame_table, monkeypatch):
+    monkeypatch.setattr(
+        PlantDetector,
+        "detect_multiple",
+        lambda self: {"labels": [], "total_instances": 0, "reprocess": False},
+    )
+    breaker = _open_circuit("dynamodb")
+
+    # The event fails so Lambda retries it instead of only holding it in memory
+    with pytest.raises(RuntimeError):
+        handler(_event("first.jpg"), None)
+    assert len(metadata._queued_writes) == 1
+    assert frame_table.scan()["Items"] == []
+
+    breaker.reset_timeout = 0  # let the next write through as a trial call
+    handler(_event("second.jpg"), None)
+
+    assert not metadata._queued_writes
+    frame_ids = {item["frame_id"] for item in frame_table.scan()["Items"]}
+    assert frame_ids == {"test-bucket/first.jpg", "test-bucket/second.jpg"}
+
+
+def test_permanent_dynamodb_error_does_not_block_queue(frame_table, monkeypatch):
+    monkeypatch.setattr(
+        PlantDetector,
+        "detect_multiple",
+        lambda self: {"labels": [], "total_instances": 0, "reprocess": False},
+    )
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "MissingTable")
+    with pytest.raises(ClientError):
+        handler(_event("first.jpg"), None)
+    assert not metadata._queued_writes
+
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "TestTable")
+    handler(_event("second.jpg"), None)
+    assert len(frame_table.scan()["Items"]) == 1
+
+
+def test_deferred_notification_flushed_by_handler(frame_table, monkeypatch):
+    monkeypatch.setattr(
+        PlantDetector,
+        "detect_multiple",
+        lambda self: {"labels": [], "total_instances": 0, "reprocess": False},
+    )
+    sns_client = boto3.client("sns", region_name="us-east-1")
+    topic_arn = sns_client.create_topic(Name="test-topic")["TopicArn"]
+    notifications._deferred_notifications.append((topic_arn, "earlier.jpg", 2))
+
+    handler(_event("test-image.jpg"), None)
+
+    assert not notifications._deferred_notifications
@@ -0,0 +1,92 @@
+import boto3
+import pytest
+from moto import mock_aws
+from utils import metadata, notifications
+from utils.circuit_breaker import get_circuit_breaker
+from utils.notifications import NotificationService
+
+from lambda_functions.persist_handler import handler
+
+
+@pytest.fixture
+def frame_table(monkeypatch):
+    """
+    Mocked DynamoDB table and SNS topic the persist function writes to.
+    """
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "TestTable")
+    with mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = dynamodb.create_table(
+            TableName="TestTable",
+            KeySchema=[{"AttributeName": "frame_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "frame_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        sns_client = boto3.client("sns", region_name="us-east-1")
+        topic_arn = sns_client.create_topic(Name="test-topic")["TopicArn"]
+        yield table, topic_arn
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """
+    Record the notifications published by the persist function.
+    """
+    calls = []
+    publish = NotificationService._publish
+
+    def record(self, topic_arn, object_key, plants_detected):
+        calls.append((topic_arn, object_key, plants_detected))
+        return publish(self, topic_arn, object_key, plants_detected)
+
+    monkeypatch.setattr(NotificationService, "_publish", record)
+    return calls
+
+
+def _frame(topic_arn, key="sync/frame.jpg", plants_detected=2):
+    return {
+        "bucket": "test-bucket",
+        "key": key,
+        "size": 11,
+        "plants_detected": plants_detected,
+        "plant_labels": [{"Name": "Plant", "Confidence": 99.5, "Instances": 2}],
+        "sns_topic_arn": topic_arn,
+    }
+
+
+def test_persists_frame_and_notifies(frame_table, sent):
+    table, topic_arn = frame_table
+    notifications._deferred_notifications.append((topic_arn, "earlier.jpg", 1))
+
+    response = handler(_frame(topic_arn), None)
+
+    assert response["statusCode"] == 200
+    item = table.get_item(Key={"frame_id": "test-bucket/sync/frame.jpg"})["Item"]
+    assert item["plants_detected"] == 2
+    assert item["needs_reprocessing"] is False
+    assert sent == [
+        (topic_arn, "sync/frame.jpg", 2),
+        (topic_arn, "earlier.jpg", 1),
+    ]
+    assert not notifications._deferred_notifications
+
+
+def test_queued_write_fails_before_notifying(frame_table, sent):
+    table, topic_arn = frame_table
+    breaker = get_circuit_breaker("dynamodb")
+    for _ in range(breaker.minimum_calls):
+        breaker.record_failure()
+
+    # Failing keeps the event for Lambda's retries; notifying first would
+    # send the notification again on every retry
+    with pytest.raises(RuntimeError):
+        handler(_frame(topic_arn), None)
+    assert len(metadata._queued_writes) == 1
+    assert sent == []
+
+    breaker.reset_timeout = 0  # let the retried write through as a trial call
+    handler(_frame(topic_arn), None)
+
+    assert not metadata._queued_writes
+    assert len(table.scan()["Items"]) == 1
+    assert sent == [(topic_arn, "sync/frame.jpg", 2)]
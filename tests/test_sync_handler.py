@@ -0,0 +1,187 @@
+import base64
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+from utils.circuit_breaker import get_circuit_breaker
+from utils.rekognition import PlantDetector
+
+from lambda_functions import persist_handler, sync_handler
+
+
+@pytest.fixture
+def aws_resources(monkeypatch):
+    """
+    Mocked S3 bucket and DynamoDB table the detection API writes to.
+    """
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", "TestTable")
+    with mock_aws():
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket="test-bucket")
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        table = dynamodb.create_table(
+            TableName="TestTable",
+            KeySchema=[{"AttributeName": "frame_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "frame_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield s3_client, table
+
+
+@pytest.fixture
+def persist_invocations(monkeypatch):
+    """
+    Record the asynchronous persist invocations made by the detection API.
+    """
+    monkeypatch.setenv("PERSIST_FUNCTION_NAME", "PersistFunction")
+    invocations = []
+
+    def invoke(**kwargs):
+        invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+    monkeypatch.setattr(sync_handler.lambda_client, "invoke", invoke)
+    return invocations
+
+
+def test_detects_from_request_bytes(aws_resources, persist_invocations, monkeypatch):
+    s3_client, table = aws_resources
+    seen = {}
+
+    def mock_detect_multiple(self):
+        seen["image"] = self._image()
+        return {
+            "labels": [{"Name": "Plant", "Confidence": 99.0, "Instances": 0}],
+            "total_instances": 0,
+            "reprocess": False,
+        }
+
+    monkeypatch.setattr(PlantDetector, "detect_multiple", mock_detect_multiple)
+
+    event = {
+        "body": base64.b64encode(b"image bytes").decode(),
+        "isBase64Encoded": True,
+        "headers": {"content-type": "image/jpeg"},
+        "queryStringParameters": {"key": "cam-1/frame.jpg"},
+    }
+    response = sync_handler.handler(event, None)
+
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["frame_id"].startswith("test-bucket/sync/cam-1/frame-")
+    assert body["frame_id"].endswith(".jpg")
+    assert body["labels"][0]["Name"] == "Plant"
+    assert body["persisted"] is True
+    assert seen["image"] == {"Bytes": b"image bytes"}
+
+    # Repeated uploads from the same camera key get distinct frames
+    again = json.loads(sync_handler.handler(event, None)["body"])
+    assert again["frame_id"] != body["frame_id"]
+
+    key = body["frame_id"].split("/", 1)[1]
+    stored = s3_client.get_object(Bucket="test-bucket", Key=key)
+    assert stored["Body"].read() == b"image bytes"
+
+    # The metadata write is left to the persist function
+    assert table.scan()["Items"] == []
+    invocation = persist_invocations[0]
+    assert invocation["FunctionName"] == "PersistFunction"
+    assert invocation["InvocationType"] == "Event"
+    persist_handler.handler(json.loads(invocation["Payload"]), None)
+    item = table.get_item(Key={"frame_id": body["frame_id"]})["Item"]
+    assert item["size"] == len(b"image bytes")
+
+
+def test_failed_upload_is_not_persisted(
+    aws_resources, persist_invocations, monkeypatch
+):
+    monkeypatch.setenv("S3_BUCKET_NAME", "missing-bucket")
+    monkeypatch.setattr(
+        PlantDetector,
+        "detect_multiple",
+        lambda self: {"labels": [], "total_instances": 0, "reprocess": False},
+    )
+    event = {
+        "body": base64.b64encode(b"image bytes").decode(),
+        "isBase64Encoded": True,
+        "headers": {"content-type": "image/jpeg"},
+    }
+
+    response = sync_handler.handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["persisted"] is False
+    assert persist_invocations == []
+
+
+def test_json_body_and_unavailable_detection(aws_resources, monkeypatch):
+    monkeypatch.setattr(
+        PlantDetector,
+        "detect_multiple",
+        lambda self: {"labels": [], "total_instances": 0, "reprocess": True},
+    )
+
+    event = {
+        "body": json.dumps({"image": base64.b64encode(b"image bytes").decode()}),
+        "isBase64Encoded": False,
+        "headers": {"content-type": "application/json"},
+    }
+    response = sync_handler.handler(event, None)
+
+    assert response["statusCode"] == 503
+    # Nothing reprocesses sync/ frames, so neither the frame nor metadata is kept
+    s3_client, table = aws_resources
+    assert table.scan()["Items"] == []
+    assert "Contents" not in s3_client.list_objects_v2(Bucket="test-bucket")
+
+
+def test_invalid_image_returns_400_without_tripping(aws_resources, monkeypatch):
+    s3_client, table = aws_resources
+    breaker = get_circuit_breaker("rekognition")
+    monkeypatch.setattr(
+        sync_handler,
+        "PlantDetector",
+        lambda *args: _stubbed_detector(
+            *args, error="InvalidImageFormatException", message="bad image"
+        ),
+    )
+    event = {
+        "body": base64.b64encode(b"not an image").decode(),
+        "isBase64Encoded": True,
+        "headers": {"content-type": "image/jpeg"},
+    }
+
+    for _ in range(breaker.minimum_calls + 1):
+        response = sync_handler.handler(event, None)
+        assert response["statusCode"] == 400
+        assert "not supported" in json.loads(response["body"])["message"]
+    assert breaker.allow_request()
+    assert table.scan()["Items"] == []
+    assert "Contents" not in s3_client.list_objects_v2(Bucket="test-bucket")
+
+
+def _stubbed_detector(bucket, key, config, image_bytes, error, message):
+    detector = PlantDetector(bucket, key, config, image_bytes)
+    stubber = Stubber(detector.rekognition_client)
+    stubber.add_client_error("detect_labels", error, message)
+    stubber.activate()
+    return detector
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"body": "", "headers": {}},
+        {"body": "not base64!", "isBase64Encoded": True, "headers": {}},
+        {
+            "body": json.dumps({"image": "aW1hZ2U=", "key": 123}),
+            "headers": {"content-type": "application/json"},
+        },
+    ],
+)
+def test_rejects_invalid_request(event):
+    response = sync_handler.handler(event, None)
+    assert response["statusCode"] == 400